@@ -1,18 +1,53 @@
-from typing import Dict, List
-from pydantic import BaseModel, Field
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from agno.models.google import Gemini
 from firecrawl import FirecrawlApp
+import requests
+import diskcache
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrent Firecrawl extract calls, to stay within rate limits
+FIRECRAWL_MAX_CONCURRENCY = 5
+# How long (in seconds) a finished analysis is reused for an identical query
+RESULT_CACHE_TTL = 3600
+# How long (in seconds) a Firecrawl extract result is kept on disk
+FIRECRAWL_CACHE_TTL = 3600
+# Per-user directory: diskcache unpickles what it finds, so it must not live in a shared temp dir
+FIRECRAWL_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "krea", "firecrawl")
+# Attempts per Firecrawl extract before a transient failure is surfaced
+FIRECRAWL_MAX_ATTEMPTS = 3
+# Budget for the property data embedded in the analysis prompt
+MAX_PROPERTIES = 10
+MAX_DESCRIPTION_CHARS = 400
+MAX_ADDRESS_CHARS = 120
+MAX_PROMPT_CHARS = 8000
+# Separates the property report from the location trends report in one reply
+SECTION_BREAK = "===SECTION_BREAK==="
+NO_TRENDS_MESSAGE = "No price trends data available"
+# Turns a normalized city name into the slug used in listing URLs
+_URL_SLUG = str.maketrans({" ": "-"})
+
 class PropertyData(BaseModel):
     """Schema for property data extraction"""
-    building_name: str = Field(description="Name of the building/property", alias="Building_name")
-    property_type: str = Field(description="Type of property (commercial, residential, etc)", alias="Property_type")
+    building_name: str = Field(description="Name of the building/property")
+    property_type: Literal["Residential", "Commercial"] = Field(description="Type of property (Residential or Commercial)")
     location_address: str = Field(description="Complete address of the property")
-    price: str = Field(description="Price of the property", alias="Price")
-    description: str = Field(description="Detailed description of the property", alias="Description")
+    price: str = Field(description="Price of the property")
+    description: str = Field(description="Detailed description of the property")
 
 class PropertiesResponse(BaseModel):
     """Schema for multiple properties response"""
@@ -36,37 +71,374 @@ class FirecrawlResponse(BaseModel):
     status: str
     expiresAt: str
 
+# JSON schema keys that only annotate; the extract prompts already spell out what is wanted
+_SCHEMA_ANNOTATIONS = frozenset({"description", "title", "examples"})
+
+def _strip_schema(schema):
+    """Drop annotation keys from a JSON schema, leaving property names intact"""
+    if isinstance(schema, list):
+        return [_strip_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    stripped = {}
+    for key, value in schema.items():
+        if key in _SCHEMA_ANNOTATIONS:
+            continue
+        if key in ("properties", "$defs"):
+            # Keys here are field / definition names, which may themselves be "description"
+            stripped[key] = {name: _strip_schema(sub) for name, sub in value.items()}
+        else:
+            stripped[key] = _strip_schema(value)
+    return stripped
+
+# Extraction schemas are constant, so generate and minify them once at import
+_PROPERTIES_SCHEMA = _strip_schema(PropertiesResponse.model_json_schema())
+_LOCATIONS_SCHEMA = _strip_schema(LocationsResponse.model_json_schema())
+
+# Validators for the extracted lists, built once and reused for every query and cache hit
+_PROPERTIES_ADAPTER = TypeAdapter(List[PropertyData])
+_LOCATIONS_ADAPTER = TypeAdapter(List[LocationData])
+
+def _validate_records(adapter: TypeAdapter, records, field: str) -> List:
+    """Batch-validate extracted records, dropping only the invalid ones if any fail"""
+    if not isinstance(records, list):
+        logger.warning("Expected a list of %s records, got: %r", field, records)
+        return []
+    try:
+        return adapter.validate_python(records)
+    except ValidationError:
+        pass
+    # Slow path: find and drop the bad records one at a time
+    valid = []
+    for record in records:
+        try:
+            valid.extend(adapter.validate_python([record]))
+        except ValidationError as e:
+            logger.warning("Dropping invalid %s record: %s", field, e)
+    return valid
+
+@lru_cache(maxsize=1024)
+def _city_slug(city: str) -> str:
+    """Normalize a city name into the slug used in listing URLs and cache keys"""
+    return city.strip().casefold().translate(_URL_SLUG)
+
+@lru_cache(maxsize=1024)
+def _build_property_urls(city_slug: str) -> Tuple[str, ...]:
+    """Listing pages searched for properties in a city"""
+    return (
+        f"https://www.squareyards.com/sale/property-for-sale-in-{city_slug}/*",
+        f"https://www.99acres.com/property-in-{city_slug}-ffid/*",
+        f"https://housing.com/in/buy/{city_slug}/{city_slug}",
+        # f"https://www.nobroker.in/property/sale/{city}/{city_slug}",
+    )
+
+@lru_cache(maxsize=1024)
+def _build_trends_urls(city_slug: str) -> Tuple[str, ...]:
+    """Pages searched for locality price trends in a city"""
+    return (
+        f"https://www.99acres.com/property-rates-and-price-trends-in-{city_slug}-prffid/*",
+    )
+
+def _trim_properties(properties: List[PropertyData]) -> List[PropertyData]:
+    """Cap the number and size of properties embedded in the analysis prompt"""
+    trimmed = []
+    total_chars = 0
+    for prop in properties[:MAX_PROPERTIES]:
+        prop = prop.model_copy(update={
+            "description": prop.description[:MAX_DESCRIPTION_CHARS],
+            "location_address": prop.location_address[:MAX_ADDRESS_CHARS],
+        })
+        total_chars += len(prop.model_dump_json())
+        if total_chars > MAX_PROMPT_CHARS:
+            break
+        trimmed.append(prop)
+    return trimmed
+
+# Analysis prompts, filled in with str.format_map on each query
+_PROPERTY_ANALYSIS_TEMPLATE = """As a real estate expert, analyze these properties and market trends:
+
+Properties Found in json format:
+{properties_json}
+
+**IMPORTANT INSTRUCTIONS:**
+1. ONLY analyze properties from the above JSON data that match the user's requirements:
+   - Property Category: {property_category}
+   - Property Type: {property_type}
+   - Maximum Price: {max_price} crores
+2. DO NOT create new categories or property types
+3. From the matching properties, select 5-6 properties with prices closest to {max_price} crores
+
+Please provide your analysis in this format:
+
+🏠 SELECTED PROPERTIES
+• List only 5-6 best matching properties with prices closest to {max_price} crores
+• For each property include:
+  - Name and Location
+  - Price (with value analysis)
+  - Key Features
+  - Pros and Cons
+
+💰 BEST VALUE ANALYSIS
+• Compare the selected properties based on:
+  - Price per sq ft
+  - Location advantage
+  - Amenities offered
+
+📍 LOCATION INSIGHTS
+• Specific advantages of the areas where selected properties are located
+
+💡 RECOMMENDATIONS
+• Top 3 properties from the selection with reasoning
+• Investment potential
+• Points to consider before purchase
+
+🤝 NEGOTIATION TIPS
+• Property-specific negotiation strategies
+
+Format your response in a clear, structured way using the above sections.
+"""
+
+_LOCATION_TRENDS_TEMPLATE = """As a real estate expert, analyze these location price trends for {city}:
+
+{locations_json}
+
+Please provide:
+1. A bullet-point summary of the price trends for each location
+2. Identify the top 3 locations with:
+   - Highest price appreciation
+   - Best rental yields
+   - Best value for money
+3. Investment recommendations:
+   - Best locations for long-term investment
+   - Best locations for rental income
+   - Areas showing emerging potential
+4. Specific advice for investors based on these trends
+
+Format the response as follows:
+
+📊 LOCATION TRENDS SUMMARY
+• [Bullet points for each location]
+
+🏆 TOP PERFORMING AREAS
+• [Bullet points for best areas]
+
+💡 INVESTMENT INSIGHTS
+• [Bullet points with investment advice]
+
+🎯 RECOMMENDATIONS
+• [Bullet points with specific recommendations]
+"""
+
+_COMBINED_ANALYSIS_TEMPLATE = """Complete both tasks below and write a separate report for each.
+Write the TASK 1 report first, then a line containing only {section_break}, then the TASK 2 report.
+Do not repeat the task headings in your reports.
+
+### TASK 1: PROPERTY RECOMMENDATIONS
+{property_task}
+
+### TASK 2: LOCATION TRENDS
+{location_task}
+"""
+
+@st.cache_resource(show_spinner=False)
+def _get_firecrawl(api_key: str) -> FirecrawlApp:
+    """Firecrawl client shared by every session using the same key"""
+    return FirecrawlApp(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def _get_model(model_id: str, api_key: str) -> OpenAIChat:
+    """Model wrapper shared by every session, so its HTTP client stays warm"""
+    model = OpenAIChat(id=model_id, api_key=api_key)
+    # Pin the client so every run reuses one connection pool, and open it in the background
+    model.client = model.get_client()
+    threading.Thread(target=_prewarm_client, args=(model.client,), daemon=True).start()
+    return model
+
+def _prewarm_client(client) -> None:
+    """Open a connection to the model API before the first search needs it"""
+    try:
+        client.models.list()
+    except Exception as e:
+        logger.debug("Model client prewarm failed: %s", e)
+
+@st.cache_resource(show_spinner=False)
+def _get_extract_cache() -> diskcache.Cache:
+    """On-disk cache of Firecrawl extract results, shared across sessions and restarts"""
+    return diskcache.Cache(FIRECRAWL_CACHE_DIR)
+
+def _extract_cache_key(urls: List[str], params: Dict, field: str) -> str:
+    """Content hash of an extract request and the response field kept from it"""
+    payload = json.dumps({"urls": urls, "params": params, "field": field}, sort_keys=True)
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
+# firecrawl-py wraps HTTP failures in ValueError(message, 500), so classify them by message.
+# Auth, billing and bad-request errors are permanent. extract() submits the job and then
+# polls it, and retrying a polling failure would submit (and bill) a new job, so failures
+# of the status endpoint (/v1/extract/<id>) count as permanent too. Only rate limits, 5xx
+# and timeouts on submission are retried.
+_PERMANENT_FIRECRAWL_ERRORS = re.compile(
+    r"Unauthorized|Payment Required|Prompt is required|Extract job failed"
+    r"|extract-status|/extract/[\w-]+"
+)
+_TRANSIENT_FIRECRAWL_ERRORS = re.compile(
+    r"Rate limit|Status code (429|5\d\d)|Internal Server Error|Bad Gateway|Service Unavailable"
+    r"|Gateway Timeout|Request Timeout|timed out",
+    re.IGNORECASE
+)
+
+def _is_transient_firecrawl_error(error: BaseException) -> bool:
+    """Whether a failed Firecrawl extract is worth retrying"""
+    message = str(error)
+    if _PERMANENT_FIRECRAWL_ERRORS.search(message):
+        return False
+    # extract() re-raises everything as ValueError; the original requests error is its context
+    if isinstance(error.__context__, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return bool(_TRANSIENT_FIRECRAWL_ERRORS.search(message))
+
+@retry(
+    retry=retry_if_exception(_is_transient_firecrawl_error),
+    stop=stop_after_attempt(FIRECRAWL_MAX_ATTEMPTS),
+    wait=wait_random_exponential(min=1, max=10),
+    reraise=True
+)
+def _extract_with_retry(firecrawl: FirecrawlApp, urls: List[str], params: Dict):
+    """Firecrawl extract, retried with jittered exponential backoff"""
+    return firecrawl.extract(urls, params)
+
 class PropertyFindingAgent:
     """Agent responsible for finding properties and providing recommendations"""
     
     def __init__(self, firecrawl_api_key: str, openai_api_key: str, model_id: str = "o3-mini"):
         self.agent = Agent(
-            model=OpenAIChat(id=model_id, api_key=openai_api_key),
+            model=_get_model(model_id, openai_api_key),
             markdown=True,
             description="I am a real estate expert who helps find and analyze properties based on user preferences."
         )
-        self.firecrawl = FirecrawlApp(api_key=firecrawl_api_key)
+        self.firecrawl = _get_firecrawl(firecrawl_api_key)
+        # Resolved here because extracts run in worker threads without a Streamlit script context
+        self._extract_cache = _get_extract_cache()
+        # Finished analyses keyed by normalized query, as (stored_at, result)
+        self._cache: Dict[Tuple, Tuple[float, str]] = {}
+
+    def _cache_get(self, key: Tuple) -> Optional[str]:
+        """Return a cached analysis, dropping it if it has expired"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > RESULT_CACHE_TTL:
+            del self._cache[key]
+            return None
+        return result
+
+    def _cache_set(self, key: Tuple, result: str) -> None:
+        self._cache[key] = (time.monotonic(), result)
+
+    def _extract(self, urls: List[str], params: Dict, field: str, adapter: TypeAdapter) -> Optional[List]:
+        """Run a Firecrawl extract and return the records under `field` that pass `adapter`.
+
+        Only the validated records are cached, so identical requests skip
+        Firecrawl, and a payload with no valid records is retried next time.
+        Returns None if the extract failed.
+        """
+        cache = self._extract_cache
+        key = _extract_cache_key(urls, params, field)
+        cached = cache.get(key)
+        if cached is not None:
+            return _validate_records(adapter, cached, field)
+
+        raw_response = _extract_with_retry(self.firecrawl, urls, params)
+        logger.debug("Raw Firecrawl Response: %s", raw_response)
+        if not (isinstance(raw_response, dict) and raw_response.get('success')):
+            return None
+
+        records = _validate_records(adapter, (raw_response.get('data') or {}).get(field, []), field)
+        if records:
+            cache.set(key, adapter.dump_python(records), expire=FIRECRAWL_CACHE_TTL)
+        return records
+
+    async def _extract_async(
+        self,
+        urls: List[str],
+        params: Dict,
+        field: str,
+        adapter: TypeAdapter,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Optional[List]:
+        """Run a blocking Firecrawl extract in a worker thread"""
+        if semaphore is None:
+            return await asyncio.to_thread(self._extract, urls, params, field, adapter)
+        async with semaphore:
+            return await asyncio.to_thread(self._extract, urls, params, field, adapter)
 
-    def find_properties(
-        self, 
+    def search(
+        self,
         city: str,
         max_price: float,
         property_category: str = "Residential",
         property_type: str = "Flat"
-    ) -> str:
-        """Find and analyze properties based on user preferences"""
-        formatted_location = city.lower()
-        
-        urls = [
-            f"https://www.squareyards.com/sale/property-for-sale-in-{formatted_location}/*",
-            f"https://www.99acres.com/property-in-{formatted_location}-ffid/*",
-            f"https://housing.com/in/buy/{formatted_location}/{formatted_location}",
-            # f"https://www.nobroker.in/property/sale/{city}/{formatted_location}",
-        ]
+    ) -> Iterator[str]:
+        """Find properties and location trends, then stream the combined analysis.
+
+        Both reports arrive in one stream, separated by SECTION_BREAK. The
+        Firecrawl extracts run before this returns, the LLM call runs as the
+        stream is consumed.
+        """
+        cache_key = (_city_slug(city), round(max_price, 1), property_category, property_type)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return iter([cached])
+
+        properties, locations = asyncio.run(
+            self._extract_all_async(city, max_price, property_category, property_type)
+        )
+        prompt = self._analysis_prompt(
+            properties, locations, city, max_price, property_category, property_type
+        )
+        # Only a reply built from complete data is worth replaying; otherwise retry next time
+        if not properties or locations is None:
+            cache_key = None
+        return self._stream_analysis(prompt, cache_key)
+
+    async def _extract_all_async(
+        self,
+        city: str,
+        max_price: float,
+        property_category: str,
+        property_type: str
+    ) -> Tuple[List[PropertyData], Optional[List[LocationData]]]:
+        # The semaphore is bound to the running loop, so build a fresh one per search
+        semaphore = asyncio.Semaphore(FIRECRAWL_MAX_CONCURRENCY)
+        return await asyncio.gather(
+            self._extract_properties_async(city, max_price, property_category, property_type, semaphore),
+            self._extract_location_trends_async(city, semaphore),
+        )
+
+    def _stream_analysis(self, prompt: str, cache_key: Optional[Tuple]) -> Iterator[str]:
+        """Yield the agent's reply as it arrives, caching it once complete unless cache_key is None"""
+        parts = []
+        for chunk in self.agent.run(prompt, stream=True):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+        if cache_key is not None:
+            self._cache_set(cache_key, "".join(parts))
+
+    async def _extract_properties_async(
+        self,
+        city: str,
+        max_price: float,
+        property_category: str = "Residential",
+        property_type: str = "Flat",
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[PropertyData]:
+        """Extract properties matching user preferences, trimmed for the prompt"""
+        urls = list(_build_property_urls(_city_slug(city)))
         
         property_type_prompt = "Flats" if property_type == "Flat" else "Individual Houses"
         
-        raw_response = self.firecrawl.extract(
+        properties = await self._extract_async(
             urls=urls,
             params={
                 'prompt': f"""Extract ONLY 10 OR LESS different {property_category} {property_type_prompt} from {city} that cost less than {max_price} crores.
@@ -80,72 +452,26 @@ class PropertyFindingAgent:
                 - IMPORTANT: Return data for at least 3 different properties. MAXIMUM 10.
                 - Format as a list of properties with their respective details
                 """,
-                'schema': PropertiesResponse.model_json_schema()
-            }
+                'schema': _PROPERTIES_SCHEMA
+            },
+            field='properties',
+            adapter=_PROPERTIES_ADAPTER,
+            semaphore=semaphore
         )
         
-        print("Raw Property Response:", raw_response)
-        
-        if isinstance(raw_response, dict) and raw_response.get('success'):
-            properties = raw_response['data'].get('properties', [])
-        else:
-            properties = []
-            
-        print("Processed Properties:", properties)
-
-        
-        analysis = self.agent.run(
-            f"""As a real estate expert, analyze these properties and market trends:
+        properties = _trim_properties(properties or [])
+        logger.debug("Processed Properties: %s", properties)
 
-            Properties Found in json format:
-            {properties}
-
-            **IMPORTANT INSTRUCTIONS:**
-            1. ONLY analyze properties from the above JSON data that match the user's requirements:
-               - Property Category: {property_category}
-               - Property Type: {property_type}
-               - Maximum Price: {max_price} crores
-            2. DO NOT create new categories or property types
-            3. From the matching properties, select 5-6 properties with prices closest to {max_price} crores
-
-            Please provide your analysis in this format:
-            
-            🏠 SELECTED PROPERTIES
-            • List only 5-6 best matching properties with prices closest to {max_price} crores
-            • For each property include:
-              - Name and Location
-              - Price (with value analysis)
-              - Key Features
-              - Pros and Cons
-
-            💰 BEST VALUE ANALYSIS
-            • Compare the selected properties based on:
-              - Price per sq ft
-              - Location advantage
-              - Amenities offered
-
-            📍 LOCATION INSIGHTS
-            • Specific advantages of the areas where selected properties are located
-
-            💡 RECOMMENDATIONS
-            • Top 3 properties from the selection with reasoning
-            • Investment potential
-            • Points to consider before purchase
-
-            🤝 NEGOTIATION TIPS
-            • Property-specific negotiation strategies
-
-            Format your response in a clear, structured way using the above sections.
-            """
-        )
-        
-        return analysis.content
+        return properties
 
-    def get_location_trends(self, city: str) -> str:
-        """Get price trends for different localities in the city"""
-        raw_response = self.firecrawl.extract([
-            f"https://www.99acres.com/property-rates-and-price-trends-in-{city.lower()}-prffid/*"
-        ], {
+    async def _extract_location_trends_async(
+        self,
+        city: str,
+        semaphore: Optional[asyncio.Semaphore] = None
+    ) -> Optional[List[LocationData]]:
+        """Extract price trends for different localities in the city"""
+        urls = list(_build_trends_urls(_city_slug(city)))
+        params = {
             'prompt': """Extract price trends data for ALL major localities in the city. 
             IMPORTANT: 
             - Return data for at least 5-10 different localities
@@ -153,57 +479,94 @@ class PropertyFindingAgent:
             - Do not skip any locality mentioned in the source
             - Format as a list of locations with their respective data
             """,
-            'schema': LocationsResponse.model_json_schema(),
-        })
+            'schema': _LOCATIONS_SCHEMA,
+        }
+        try:
+            locations = await self._extract_async(urls, params, 'locations', _LOCATIONS_ADAPTER, semaphore)
+        except Exception as e:
+            # Trends are secondary; a failed extract must not discard the property results
+            logger.warning("Location trends extract failed: %s", e)
+            return None
         
-        if isinstance(raw_response, dict) and raw_response.get('success'):
-            locations = raw_response['data'].get('locations', [])
-    
-            analysis = self.agent.run(
-                f"""As a real estate expert, analyze these location price trends for {city}:
-
-                {locations}
-
-                Please provide:
-                1. A bullet-point summary of the price trends for each location
-                2. Identify the top 3 locations with:
-                   - Highest price appreciation
-                   - Best rental yields
-                   - Best value for money
-                3. Investment recommendations:
-                   - Best locations for long-term investment
-                   - Best locations for rental income
-                   - Areas showing emerging potential
-                4. Specific advice for investors based on these trends
-
-                Format the response as follows:
-                
-                📊 LOCATION TRENDS SUMMARY
-                • [Bullet points for each location]
+        return locations or None
+
+    def _analysis_prompt(
+        self,
+        properties: List[PropertyData],
+        locations: Optional[List[LocationData]],
+        city: str,
+        max_price: float,
+        property_category: str,
+        property_type: str
+    ) -> str:
+        """Build a single prompt covering the property and location trend analyses"""
+        property_task = _PROPERTY_ANALYSIS_TEMPLATE.format_map({
+            "properties_json": _PROPERTIES_ADAPTER.dump_json(properties).decode(),
+            "property_category": property_category,
+            "property_type": property_type,
+            "max_price": max_price,
+        })
+        if locations is None:
+            return property_task
+
+        location_task = _LOCATION_TRENDS_TEMPLATE.format_map({
+            "city": city,
+            "locations_json": _LOCATIONS_ADAPTER.dump_json(locations).decode(),
+        })
+        return _COMBINED_ANALYSIS_TEMPLATE.format_map({
+            "section_break": SECTION_BREAK,
+            "property_task": property_task,
+            "location_task": location_task,
+        })
 
-                🏆 TOP PERFORMING AREAS
-                • [Bullet points for best areas]
+class SectionStream:
+    """Splits a stream of text chunks at the first SECTION_BREAK"""
 
-                💡 INVESTMENT INSIGHTS
-                • [Bullet points with investment advice]
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = iter(chunks)
+        self._remainder = ""
+        self.found_break = False
 
-                🎯 RECOMMENDATIONS
-                • [Bullet points with specific recommendations]
-                """
-            )
-            
-            return analysis.content
-            
-        return "No price trends data available"
+    def first(self) -> Iterator[str]:
+        """Yield text up to the section break"""
+        # Hold back enough text that a break split across chunks is still seen
+        holdback = len(SECTION_BREAK) - 1
+        buffer = ""
+        for chunk in self._chunks:
+            buffer += chunk
+            head, found, tail = buffer.partition(SECTION_BREAK)
+            if found:
+                self.found_break = True
+                self._remainder = tail
+                if head:
+                    yield head
+                return
+            if len(buffer) > holdback:
+                yield buffer[:-holdback]
+                buffer = buffer[-holdback:]
+        if buffer:
+            yield buffer
+
+    def second(self) -> Iterator[str]:
+        """Yield the text after the section break; call once first() is exhausted"""
+        if self._remainder:
+            yield self._remainder
+        yield from self._chunks
 
 def create_property_agent():
-    """Create PropertyFindingAgent with API keys from session state"""
-    if 'property_agent' not in st.session_state:
+    """Create PropertyFindingAgent with API keys from session state.
+
+    Reruns reuse the existing agent; it is only rebuilt when the keys or
+    model change.
+    """
+    config = (st.session_state.firecrawl_key, st.session_state.openai_key, st.session_state.model_id)
+    if st.session_state.get('property_agent_config') != config:
         st.session_state.property_agent = PropertyFindingAgent(
             firecrawl_api_key=st.session_state.firecrawl_key,
             openai_api_key=st.session_state.openai_key,
             model_id=st.session_state.model_id
         )
+        st.session_state.property_agent_config = config
 
 def main():
     st.set_page_config(
@@ -266,38 +629,41 @@ def main():
     "Idukki",
     "Wayanad"
     ]
-    col1, col2 = st.columns(2)
+    with st.form("search_form"):
+        col1, col2 = st.columns(2)
     
-    with col1:
-        #city = st.text_input(
-        #    "City",
-        #    placeholder="Enter city name (e.g., Bangalore)",
-        #    help="Enter the city where you want to search for properties"
-        #)
-        city = st.selectbox("Select a city in Kerala", kerala_cities)
-        property_category = st.selectbox(
-            "Property Category",
-            options=["Residential", "Commercial"],
-            help="Select the type of property you're interested in"
-        )
+        with col1:
+            #city = st.text_input(
+            #    "City",
+            #    placeholder="Enter city name (e.g., Bangalore)",
+            #    help="Enter the city where you want to search for properties"
+            #)
+            city = st.selectbox("Select a city in Kerala", kerala_cities)
+            property_category = st.selectbox(
+                "Property Category",
+                options=["Residential", "Commercial"],
+                help="Select the type of property you're interested in"
+            )
 
-    with col2:
-        max_price = st.number_input(
-            "Maximum Price (in Crores)",
-            min_value=0.1,
-            max_value=100.0,
-            value=5.0,
-            step=0.1,
-            help="Enter your maximum budget in Crores"
-        )
+        with col2:
+            max_price = st.number_input(
+                "Maximum Price (in Crores)",
+                min_value=0.1,
+                max_value=100.0,
+                value=5.0,
+                step=0.1,
+                help="Enter your maximum budget in Crores"
+            )
         
-        property_type = st.selectbox(
-            "Property Type",
-            options=["Flat", "Individual House"],
-            help="Select the specific type of property"
-        )
+            property_type = st.selectbox(
+                "Property Type",
+                options=["Flat", "Individual House"],
+                help="Select the specific type of property"
+            )
+
+        submitted = st.form_submit_button("🔍 Start Search", use_container_width=True)
 
-    if st.button("🔍 Start Search", use_container_width=True):
+    if submitted:
         if 'property_agent' not in st.session_state:
             st.error("⚠️ Please enter your API keys in the sidebar first!")
             return
@@ -307,28 +673,29 @@ def main():
             return
             
         try:
-            with st.spinner("🔍 Searching for properties..."):
-                property_results = st.session_state.property_agent.find_properties(
+            with st.spinner("🔍 Searching for properties and location trends..."):
+                analysis = st.session_state.property_agent.search(
                     city=city,
                     max_price=max_price,
                     property_category=property_category,
                     property_type=property_type
                 )
                 
-                st.success("✅ Property search completed!")
-                
-                st.subheader("🏘️ Property Recommendations")
-                st.markdown(property_results)
-                
-                st.divider()
-                
-                with st.spinner("📊 Analyzing location trends..."):
-                    location_trends = st.session_state.property_agent.get_location_trends(city)
-                    
-                    st.success("✅ Location analysis completed!")
-                    
-                    with st.expander("📈 Location Trends Analysis of the city"):
-                        st.markdown(location_trends)
+            st.success("✅ Property search completed!")
+            
+            sections = SectionStream(analysis)
+            st.subheader("🏘️ Property Recommendations")
+            st.write_stream(sections.first())
+            
+            st.divider()
+            
+            with st.expander("📈 Location Trends Analysis of the city"):
+                if sections.found_break:
+                    st.write_stream(sections.second())
+                else:
+                    st.markdown(NO_TRENDS_MESSAGE)
+            
+            st.success("✅ Location analysis completed!")
                 
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")